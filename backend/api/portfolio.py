@@ -3,25 +3,31 @@ Portfolio Optimization API Endpoints
 Handles portfolio optimization and efficient frontier calculations
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, Dict, List
+import asyncio
+import logging
 import numpy as np
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from services.data_fetcher import fetch_stock_data
 from services.optimizer import (
-    calculate_expected_returns,
-    calculate_covariance_matrix,
+    compute_returns_mu_S,
     optimize_portfolio,
     simulate_efficient_frontier,
     calculate_dollar_allocations
 )
 
-router = APIRouter()
+# orjson encodes the simulated-portfolio float lists much faster than stdlib json
+router = APIRouter(default_response_class=ORJSONResponse)
+
+logger = logging.getLogger(__name__)
+
+# Every simulated portfolio costs ~50 bytes of JSON, so the JSON endpoint stays at
+# the default sample count; larger clouds go through /efficient-frontier/binary
+MAX_JSON_PORTFOLIOS = 5000
+MAX_BINARY_PORTFOLIOS = 50000
 
 
 # Request Models
@@ -39,6 +45,8 @@ class OptimizationRequest(BaseModel):
 # Response Models
 class PerformanceMetrics(BaseModel):
     """Performance metrics for a portfolio"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     expected_return: float
     volatility: float
     sharpe_ratio: float
@@ -46,6 +54,8 @@ class PerformanceMetrics(BaseModel):
 
 class OptimizationResponse(BaseModel):
     """Response model for portfolio optimization"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     weights: Dict[str, float]
     performance: PerformanceMetrics
     allocations: Dict[str, float]
@@ -53,6 +63,8 @@ class OptimizationResponse(BaseModel):
 
 class SimulatedPortfolios(BaseModel):
     """Simulated portfolios for efficient frontier"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     returns: List[float]
     volatilities: List[float]
     sharpe_ratios: List[float]
@@ -60,12 +72,16 @@ class SimulatedPortfolios(BaseModel):
 
 class OptimalPortfolios(BaseModel):
     """Optimal portfolios"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     max_sharpe: OptimizationResponse
     min_volatility: OptimizationResponse
 
 
 class BenchmarkPerformance(BaseModel):
     """S&P 500 benchmark performance"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     total_return: float
     annualized_return: float
     volatility: float
@@ -74,6 +90,8 @@ class BenchmarkPerformance(BaseModel):
 
 class RiskMetrics(BaseModel):
     """Risk analysis metrics"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     value_at_risk_95: float  # VaR at 95% confidence level
     value_at_risk_99: float  # VaR at 99% confidence level
     max_drawdown: float  # Maximum peak-to-trough decline
@@ -82,6 +100,8 @@ class RiskMetrics(BaseModel):
 
 class EfficientFrontierResponse(BaseModel):
     """Response model for efficient frontier data"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     simulated_portfolios: SimulatedPortfolios
     optimal_portfolios: OptimalPortfolios
     benchmark: Optional[BenchmarkPerformance] = None
@@ -116,14 +136,14 @@ async def optimize_portfolio_endpoint(request: OptimizationRequest):
             raise HTTPException(status_code=400, detail="target_volatility required for efficient_risk optimization")
 
         # Fetch historical data
-        price_data = fetch_stock_data(request.tickers, request.start_date)
+        price_data = await asyncio.to_thread(fetch_stock_data, request.tickers, request.start_date)
 
-        # Calculate expected returns and covariance matrix
-        mu = calculate_expected_returns(price_data)
-        S = calculate_covariance_matrix(price_data)
+        # Calculate returns, expected returns and covariance matrix
+        _, mu, S = await asyncio.to_thread(compute_returns_mu_S, price_data)
 
-        # Optimize portfolio
-        weights, performance = optimize_portfolio(
+        # Optimize portfolio (CPU-bound solver, keep it off the event loop)
+        weights, performance = await asyncio.to_thread(
+            optimize_portfolio,
             mu, S,
             request.optimization_type,
             request.target_volatility,
@@ -133,11 +153,13 @@ async def optimize_portfolio_endpoint(request: OptimizationRequest):
         # Calculate dollar allocations
         allocations = calculate_dollar_allocations(weights, request.investment_amount)
 
-        return OptimizationResponse(
-            weights=weights,
-            performance=PerformanceMetrics(**performance),
-            allocations=allocations
-        )
+        # The payload is assembled from already-validated values, so skip the response
+        # model pass and hand it straight to orjson (response_model still documents it)
+        return ORJSONResponse(content={
+            "weights": weights,
+            "performance": performance,
+            "allocations": allocations
+        })
 
     except HTTPException:
         raise
@@ -165,48 +187,60 @@ async def get_efficient_frontier_endpoint(request: OptimizationRequest):
         if request.investment_amount <= 0:
             raise HTTPException(status_code=400, detail="Investment amount must be positive")
 
-        # Fetch historical data
-        price_data = fetch_stock_data(request.tickers, request.start_date)
-
-        # Calculate expected returns and covariance matrix
-        mu = calculate_expected_returns(price_data)
-        S = calculate_covariance_matrix(price_data)
-
-        # Simulate efficient frontier
-        sim_returns, sim_vols, sim_sharpes = simulate_efficient_frontier(mu, S)
-
-        # Calculate Max Sharpe portfolio
-        max_sharpe_weights, max_sharpe_perf = optimize_portfolio(
-            mu, S, "max_sharpe", max_weight=request.max_weight
+        # Fetch historical data, pulling SPY in the same download when a benchmark is
+        # requested; if SPY can't be fetched it is left out and the benchmark is skipped
+        fetch_spy = request.compare_sp500 and 'SPY' not in request.tickers
+        price_data = await asyncio.to_thread(
+            fetch_stock_data,
+            request.tickers,
+            request.start_date,
+            optional_tickers=['SPY'] if fetch_spy else None
         )
-        max_sharpe_allocations = calculate_dollar_allocations(max_sharpe_weights, request.investment_amount)
 
-        # Calculate Min Volatility portfolio
-        min_vol_weights, min_vol_perf = optimize_portfolio(
-            mu, S, "min_volatility", max_weight=request.max_weight
+        spy_prices = None
+        if request.compare_sp500 and 'SPY' in price_data.columns:
+            spy_prices = price_data['SPY']
+            if fetch_spy:
+                price_data = price_data.drop(columns=['SPY'])
+
+        # Calculate daily returns once and share them across mu, S and the risk metrics
+        returns, mu, S = await asyncio.to_thread(compute_returns_mu_S, price_data)
+
+        # Simulate efficient frontier and solve the Max Sharpe / Min Volatility portfolios
+        # concurrently - all three only read (mu, S), and running them in worker threads
+        # keeps the event loop free for other requests
+        (
+            (sim_returns, sim_vols, sim_sharpes),
+            (max_sharpe_weights, max_sharpe_perf),
+            (min_vol_weights, min_vol_perf),
+        ) = await asyncio.gather(
+            asyncio.to_thread(simulate_efficient_frontier, mu, S, MAX_JSON_PORTFOLIOS),
+            asyncio.to_thread(optimize_portfolio, mu, S, "max_sharpe", None, request.max_weight),
+            asyncio.to_thread(optimize_portfolio, mu, S, "min_volatility", None, request.max_weight),
         )
+
+        max_sharpe_allocations = calculate_dollar_allocations(max_sharpe_weights, request.investment_amount)
         min_vol_allocations = calculate_dollar_allocations(min_vol_weights, request.investment_amount)
 
         # Calculate S&P 500 benchmark if requested
         benchmark_data = None
-        if request.compare_sp500:
+        if spy_prices is not None:
             try:
-                # Fetch SPY data for the same period
-                spy_data = fetch_stock_data(['SPY'], request.start_date)
+                # Work on the raw price array to avoid intermediate pandas Series
+                p = np.ascontiguousarray(spy_prices.to_numpy(dtype=np.float64))
 
-                if not spy_data.empty and 'SPY' in spy_data.columns:
+                if p.size > 0:
                     # Calculate SPY returns
-                    spy_prices = spy_data['SPY']
-                    spy_total_return = (spy_prices.iloc[-1] - spy_prices.iloc[0]) / spy_prices.iloc[0]
+                    spy_total_return = float(p[-1] / p[0] - 1)
 
                     # Calculate annualized return
-                    days = len(spy_prices)
+                    days = p.size
                     years = days / 252  # Trading days per year
                     spy_annualized_return = (1 + spy_total_return) ** (1 / years) - 1 if years > 0 else spy_total_return
 
-                    # Calculate SPY volatility
-                    spy_returns = spy_prices.pct_change().dropna()
-                    spy_volatility = spy_returns.std() * (252 ** 0.5)  # Annualized volatility
+                    # Calculate SPY volatility from daily log returns
+                    log_returns = np.diff(np.log(p))
+                    spy_volatility = float(log_returns.std(ddof=1) * np.sqrt(252))  # Annualized volatility
 
                     # Get portfolio return based on optimization type
                     portfolio_return = max_sharpe_perf['expected_return'] if request.optimization_type != 'min_volatility' else min_vol_perf['expected_return']
@@ -214,73 +248,133 @@ async def get_efficient_frontier_endpoint(request: OptimizationRequest):
                     # Calculate outperformance
                     outperformance = portfolio_return - spy_annualized_return
 
-                    benchmark_data = BenchmarkPerformance(
-                        total_return=spy_total_return,
-                        annualized_return=spy_annualized_return,
-                        volatility=spy_volatility,
-                        outperformance=outperformance
-                    )
-            except Exception as e:
-                # If SPY fetch fails, continue without benchmark
-                print(f"Warning: Failed to fetch SPY benchmark data: {e}")
+                    benchmark_data = {
+                        "total_return": spy_total_return,
+                        "annualized_return": float(spy_annualized_return),
+                        "volatility": spy_volatility,
+                        "outperformance": float(outperformance)
+                    }
+            except Exception:
+                # If SPY data is unusable, continue without benchmark
+                logger.warning("Failed to fetch SPY benchmark data", exc_info=True)
 
         # Calculate risk metrics for optimized portfolio
         risk_metrics_data = None
         try:
             # Use max_sharpe weights for risk analysis
-            weights_array = np.array([max_sharpe_weights[ticker] for ticker in request.tickers])
-
-            # Calculate portfolio returns over time
-            returns_df = price_data.pct_change().dropna()
-            portfolio_returns = returns_df.dot(weights_array)
-
-            # Value at Risk (VaR) using historical simulation
-            # VaR 95%: There's a 5% chance of losing more than this amount in one day
-            var_95 = np.percentile(portfolio_returns, 5) * request.investment_amount
-            # VaR 99%: There's a 1% chance of losing more than this amount in one day
-            var_99 = np.percentile(portfolio_returns, 1) * request.investment_amount
-
-            # Calculate maximum drawdown
-            portfolio_values = (1 + portfolio_returns).cumprod() * request.investment_amount
-            running_max = portfolio_values.expanding().max()
-            drawdown = (portfolio_values - running_max) / running_max
-            max_drawdown = drawdown.min()
-
-            # Find max drawdown duration
-            max_dd_idx = drawdown.idxmin()
-            # Find the previous peak
-            peak_idx = portfolio_values[:max_dd_idx].idxmax() if len(portfolio_values[:max_dd_idx]) > 0 else portfolio_values.index[0]
-            max_dd_duration = (max_dd_idx - peak_idx).days if hasattr((max_dd_idx - peak_idx), 'days') else len(portfolio_values[peak_idx:max_dd_idx])
-
-            risk_metrics_data = RiskMetrics(
-                value_at_risk_95=abs(var_95),
-                value_at_risk_99=abs(var_99),
-                max_drawdown=abs(max_drawdown),
-                max_drawdown_duration_days=max_dd_duration
+            weights_array = np.fromiter(
+                (max_sharpe_weights[ticker] for ticker in request.tickers),
+                dtype=np.float64,
+                count=len(request.tickers)
             )
-        except Exception as e:
-            print(f"Warning: Failed to calculate risk metrics: {e}")
-
-        return EfficientFrontierResponse(
-            simulated_portfolios=SimulatedPortfolios(
-                returns=sim_returns,
-                volatilities=sim_vols,
-                sharpe_ratios=sim_sharpes
-            ),
-            optimal_portfolios=OptimalPortfolios(
-                max_sharpe=OptimizationResponse(
-                    weights=max_sharpe_weights,
-                    performance=PerformanceMetrics(**max_sharpe_perf),
-                    allocations=max_sharpe_allocations
-                ),
-                min_volatility=OptimizationResponse(
-                    weights=min_vol_weights,
-                    performance=PerformanceMetrics(**min_vol_perf),
-                    allocations=min_vol_allocations
-                )
-            ),
-            benchmark=benchmark_data,
-            risk_metrics=risk_metrics_data
+
+            # Calculate portfolio returns over time on the raw returns matrix (columns in request order)
+            R = np.asfortranarray(returns[request.tickers].to_numpy(dtype=np.float64))
+            portfolio_returns = R @ weights_array
+
+            # VaR and drawdown are bandwidth-bound scans; float32 is ample precision for
+            # daily returns and halves the bytes moved
+            pr = portfolio_returns.astype(np.float32)
+
+            # VaR and drawdown need at least two daily returns to mean anything
+            if pr.size >= 2:
+                # Value at Risk (VaR) using historical simulation
+                # VaR 95%: There's a 5% chance of losing more than this amount in one day
+                # VaR 99%: There's a 1% chance of losing more than this amount in one day
+                var_95, var_99 = np.percentile(pr, [5.0, 1.0], method='lower') * request.investment_amount
+
+                # Calculate maximum drawdown against the running peak
+                portfolio_values = (1.0 + pr).cumprod() * request.investment_amount
+                running_max = np.maximum.accumulate(portfolio_values)
+                drawdown = (portfolio_values - running_max) / running_max
+
+                # Find max drawdown and the previous peak
+                max_dd_idx = int(drawdown.argmin())
+                peak_idx = int(portfolio_values[:max_dd_idx + 1].argmax())
+                max_drawdown = float(drawdown[max_dd_idx])
+
+                # Find max drawdown duration
+                dd_span = returns.index[max_dd_idx] - returns.index[peak_idx]
+                max_dd_duration = dd_span.days if hasattr(dd_span, 'days') else max_dd_idx - peak_idx + 1
+
+                risk_metrics_data = {
+                    "value_at_risk_95": abs(float(var_95)),
+                    "value_at_risk_99": abs(float(var_99)),
+                    "max_drawdown": abs(max_drawdown),
+                    "max_drawdown_duration_days": int(max_dd_duration)
+                }
+        except Exception:
+            logger.warning("Failed to calculate risk metrics", exc_info=True)
+
+        # Same fast path as /optimize: the response tree is built from validated values
+        return ORJSONResponse(content={
+            "simulated_portfolios": {
+                "returns": sim_returns,
+                "volatilities": sim_vols,
+                "sharpe_ratios": sim_sharpes
+            },
+            "optimal_portfolios": {
+                "max_sharpe": {
+                    "weights": max_sharpe_weights,
+                    "performance": max_sharpe_perf,
+                    "allocations": max_sharpe_allocations
+                },
+                "min_volatility": {
+                    "weights": min_vol_weights,
+                    "performance": min_vol_perf,
+                    "allocations": min_vol_allocations
+                }
+            },
+            "benchmark": benchmark_data,
+            "risk_metrics": risk_metrics_data
+        })
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Efficient frontier calculation failed: {str(e)}")
+
+
+@router.post("/efficient-frontier/binary")
+async def get_efficient_frontier_binary_endpoint(
+    request: OptimizationRequest,
+    num_portfolios: int = Query(MAX_JSON_PORTFOLIOS, ge=1, le=MAX_BINARY_PORTFOLIOS, description="Number of portfolios to simulate")
+):
+    """
+    Get simulated efficient frontier portfolios as a packed binary payload
+
+    The body is three consecutive little-endian float32 arrays of length N
+    (returns, volatilities, sharpe ratios); N is sent in the X-Num-Portfolios header.
+    Decode in the browser with `new Float32Array(await response.arrayBuffer())`.
+
+    - **tickers**: List of stock ticker symbols
+    - **start_date**: Start date for historical data (YYYY-MM-DD)
+    - **num_portfolios**: Number of random portfolios (query parameter, max 50000)
+    """
+    try:
+        # Validate inputs
+        if len(request.tickers) < 2:
+            raise HTTPException(status_code=400, detail="At least 2 tickers required")
+
+        # Fetch historical data
+        price_data = await asyncio.to_thread(fetch_stock_data, request.tickers, request.start_date)
+
+        # Calculate returns, expected returns and covariance matrix
+        _, mu, S = await asyncio.to_thread(compute_returns_mu_S, price_data)
+
+        # Simulate efficient frontier
+        sim_returns, sim_vols, sim_sharpes = await asyncio.to_thread(
+            simulate_efficient_frontier, mu, S, num_portfolios
+        )
+
+        payload = np.stack([sim_returns, sim_vols, sim_sharpes]).astype('<f4').tobytes()
+
+        return Response(
+            content=payload,
+            media_type="application/octet-stream",
+            headers={"X-Num-Portfolios": str(num_portfolios)}
         )
 
     except HTTPException:
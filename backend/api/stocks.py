@@ -4,22 +4,23 @@ Handles fetching historical market data and stock information
 """
 
 from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, Dict, List
 from datetime import datetime
-
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
 
 from services.data_fetcher import fetch_stock_data, get_stock_info, validate_ticker_format
 
-router = APIRouter()
+# orjson keeps the per-ticker price lists from /historical cheap to encode
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 # Response Models
 class StockDataResponse(BaseModel):
     """Response model for historical stock data"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     dates: List[str]
     tickers: List[str]
     prices: Dict[str, List[float]]
@@ -28,6 +29,8 @@ class StockDataResponse(BaseModel):
 
 class StockInfoResponse(BaseModel):
     """Response model for stock information"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     ticker: str
     name: str
     sector: str
@@ -53,9 +56,9 @@ async def get_historical_data(
         ticker_list = [t.strip().upper() for t in tickers.split(",")]
 
         # Validate tickers
-        for ticker in ticker_list:
-            if not validate_ticker_format(ticker):
-                raise HTTPException(status_code=400, detail=f"Invalid ticker format: {ticker}")
+        bad_tickers = [t for t in ticker_list if not validate_ticker_format(t)]
+        if bad_tickers:
+            raise HTTPException(status_code=400, detail=f"Invalid ticker format: {bad_tickers[0]}")
 
         if len(ticker_list) < 1:
             raise HTTPException(status_code=400, detail="At least 1 ticker is required")
@@ -69,15 +72,13 @@ async def get_historical_data(
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
         # Fetch data
-        price_data = fetch_stock_data(ticker_list, start_date, end_date)
+        price_data = await asyncio.to_thread(fetch_stock_data, ticker_list, start_date, end_date)
 
         # Format response
-        dates = [date.strftime("%Y-%m-%d") for date in price_data.index]
+        dates = price_data.index.strftime("%Y-%m-%d").tolist()
         tickers_returned = list(price_data.columns)
 
-        prices = {}
-        for ticker in tickers_returned:
-            prices[ticker] = price_data[ticker].tolist()
+        prices = price_data.to_dict(orient='list')
 
         message = None
         if len(tickers_returned) < len(ticker_list):
@@ -116,7 +117,7 @@ async def get_stock_information(
             raise HTTPException(status_code=400, detail=f"Invalid ticker format: {ticker}")
 
         # Get stock info
-        info = get_stock_info(ticker)
+        info = await asyncio.to_thread(get_stock_info, ticker)
 
         return StockInfoResponse(**info)
 
@@ -3,24 +3,52 @@ CFO's Cockpit - FastAPI Backend
 Real-Time Portfolio Optimization Engine API
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
+import logging
+import logging.handlers
 import os
+import queue
 
 # Load environment variables
 load_dotenv()
 
+# Logging - handlers only enqueue records; a background listener thread writes them
+# to stderr, so request handlers never wait on console I/O
+_log_queue = queue.SimpleQueue()
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _console_handler)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))  # Full format is applied by the listener
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[_queue_handler])
+logger = logging.getLogger(__name__)
+
 # Import API routers
 from api import stocks, portfolio
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the log listener for the lifetime of the app, flushing it on shutdown"""
+    _log_listener.start()
+    try:
+        yield
+    finally:
+        _log_listener.stop()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="CFO's Cockpit API",
     description="Portfolio Optimization Engine API powered by Modern Portfolio Theory",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS Configuration - Allow frontend to communicate with backend
@@ -35,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Num-Portfolios"],  # Read by the binary efficient frontier client
 )
 
 # Include API routers
@@ -60,17 +89,11 @@ async def health_check():
 
 
 # Global exception handler
-from fastapi import Request
-from fastapi.responses import JSONResponse
-
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for all unhandled exceptions"""
-    import traceback
-
     # Log the full traceback for debugging
-    print(f"ERROR: {exc}")
-    print(traceback.format_exc())
+    logger.error("Unhandled error on %s %s: %s", request.method, request.url.path, exc, exc_info=exc)
 
     return JSONResponse(
         status_code=500,
@@ -0,0 +1,96 @@
+"""
+Shared Cache Service - Redis Integration
+Optional cross-process cache for market data and computed results
+"""
+
+import logging
+import os
+import pickle
+import threading
+import redis
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis_client():
+    """
+    Get the shared Redis client
+
+    Redis is optional: set REDIS_URL (e.g. redis://localhost:6379/0) to enable it.
+    Values are pickled, so the instance must only be writable by trusted clients.
+
+    Returns:
+        redis.Redis client, or None when REDIS_URL is not configured
+    """
+    global _client
+
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Short timeouts so a slow or unreachable Redis degrades to a cache miss
+                _client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    return _client
+
+
+def cache_get(key: str):
+    """
+    Fetch a cached value
+
+    Args:
+        key: Cache key
+
+    Returns:
+        The cached object, or None on a miss, when Redis is disabled, if Redis errors,
+        or if the stored entry cannot be unpickled (it is then deleted)
+    """
+    client = get_redis_client()
+    if client is None:
+        return None
+
+    try:
+        payload = client.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis read failed for %s: %s", key, e)
+        return None
+
+    if payload is None:
+        return None
+
+    try:
+        return pickle.loads(payload)
+    except Exception as e:
+        # Corrupt, foreign, or written by incompatible library versions: drop it and
+        # treat it as a miss so the caller recomputes
+        logger.warning("Discarding unreadable cache entry %s: %s", key, e)
+        try:
+            client.delete(key)
+        except redis.RedisError:
+            pass
+        return None
+
+
+def cache_set(key: str, value, ttl: int):
+    """
+    Store a value with an expiry; a no-op when Redis is disabled or unavailable
+
+    Args:
+        key: Cache key
+        value: Any picklable object
+        ttl: Time to live in seconds
+    """
+    client = get_redis_client()
+    if client is None:
+        return
+
+    try:
+        client.setex(key, ttl, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except redis.RedisError as e:
+        logger.warning("Redis write failed for %s: %s", key, e)
@@ -8,16 +8,61 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from functools import lru_cache
-import hashlib
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cachetools import TTLCache
+import logging
+import re
+import threading
+import xxhash
+import zlib
+
+from services.cache import cache_get, cache_set
+
+logger = logging.getLogger(__name__)
 
 # Set user agent to avoid blocking
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 session = requests.Session()
 session.headers.update({
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 })
 
+# Shared by every yfinance call so connections (and their TLS handshakes) are reused;
+# the pool is sized for the concurrent per-ticker downloads
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.3))
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+
+# The one ticker rule shared by every endpoint (via validate_ticker_format): letters,
+# digits, dots and hyphens with no length cap, so Yahoo symbols such as BRK.B, BTC-USD
+# and 12-character 0P... fund codes pass. At least one letter or digit is required, so
+# punctuation-only strings like "." or "--" are rejected; checked in a single pass
+_TICKER_RE = re.compile(r'\A(?=[.\-]*[A-Za-z0-9])[A-Za-z0-9.\-]+\Z')
+
+# Process-wide cache of cleaned price data, keyed by get_cache_key()
+# Entries expire after 15 minutes so intraday requests still pick up new closes
+PRICE_CACHE_TTL = 900
+_price_cache = TTLCache(maxsize=256, ttl=PRICE_CACHE_TTL)
+_price_cache_lock = threading.Lock()
+
+# Redis (when REDIS_URL is set) shares fetched prices across workers and restarts
+PRICE_REDIS_TTL = 3600
+
+# Company metadata rarely changes, so keep it in Redis for a day
+STOCK_INFO_REDIS_TTL = 86400
+
+# Upper bound on concurrent per-ticker requests to Yahoo in the fallback path
+MAX_DOWNLOAD_WORKERS = 8
+
+# Symbols per bulk yf.download call
+BULK_CHUNK_SIZE = 20
+
+# yf.download resets and fills module-level state (yfinance.shared._DFS) on every call,
+# so only one may run at a time across all request threads
+_yf_download_lock = threading.Lock()
+
 
 def generate_mock_stock_data(tickers: list, start_date: str, end_date: str):
     """
@@ -31,7 +76,7 @@ def generate_mock_stock_data(tickers: list, start_date: str, end_date: str):
     Returns:
         pandas DataFrame with simulated prices
     """
-    print("⚠️ Using MOCK DATA (Yahoo Finance unavailable)")
+    logger.warning("⚠️ Using MOCK DATA (Yahoo Finance unavailable)")
 
     # Parse dates
     start = pd.to_datetime(start_date)
@@ -40,9 +85,6 @@ def generate_mock_stock_data(tickers: list, start_date: str, end_date: str):
     # Generate trading days (excluding weekends)
     date_range = pd.bdate_range(start=start, end=end)
 
-    # Create price data for each ticker
-    prices = pd.DataFrame(index=date_range)
-
     # Different starting prices and volatilities for each ticker
     # Significantly increased drift to guarantee positive expected returns above risk-free rate (~3%)
     # Daily drift of 0.0008-0.0012 translates to ~20-30% annual return
@@ -64,24 +106,172 @@ def generate_mock_stock_data(tickers: list, start_date: str, end_date: str):
         'GLD': {'start_price': 180, 'drift': 0.0007, 'volatility': 0.015},
     }
 
-    for ticker in tickers:
-        # Get params or use defaults (much higher drift to guarantee optimization works)
-        params = stock_params.get(ticker, {'start_price': 100, 'drift': 0.0010, 'volatility': 0.02})
+    # Get params or use defaults (much higher drift to guarantee optimization works)
+    default_params = {'start_price': 100, 'drift': 0.0010, 'volatility': 0.02}
+    params = [stock_params.get(ticker, default_params) for ticker in tickers]
+    start_prices = np.array([p['start_price'] for p in params], dtype=np.float32)[:, None]
+    drifts = np.array([p['drift'] for p in params], dtype=np.float32)[:, None]
+    vols = np.array([p['volatility'] for p in params], dtype=np.float32)[:, None]
+
+    # One float32 array (a row per ticker) holds the shocks and is turned into prices
+    # in place. Each ticker gets its own generator seeded from its symbol, so its series
+    # doesn't depend on the rest of the basket and the global NumPy random state is
+    # never touched.
+    paths = np.empty((len(tickers), len(date_range)), dtype=np.float32)
+    for row, ticker in zip(paths, tickers):
+        np.random.default_rng(zlib.crc32(ticker.encode())).standard_normal(dtype=np.float32, out=row)
+
+    # Random walks with drift, compounded into prices
+    paths *= vols
+    paths += drifts
+    np.cumsum(paths, axis=1, out=paths)
+    np.exp(paths, out=paths)
+    paths *= start_prices
+
+    # The transpose is a view, so each ticker's column stays contiguous in the frame
+    prices = pd.DataFrame(paths.T, index=date_range, columns=tickers)
+
+    logger.info("  ✅ Generated %d days of mock data for %d tickers", len(prices), len(tickers))
 
-        # Generate random walk with drift
-        np.random.seed(hash(ticker) % 1000)  # Consistent data for same ticker
-        returns = np.random.normal(params['drift'], params['volatility'], len(date_range))
+    return prices
 
-        # Calculate cumulative prices
-        price_series = params['start_price'] * np.exp(np.cumsum(returns))
-        prices[ticker] = price_series
 
-    print(f"  ✅ Generated {len(prices)} days of mock data for {len(tickers)} tickers")
+def _forward_fill_and_trim(prices: pd.DataFrame):
+    """
+    Forward fill missing prices and drop leading rows where any ticker has no price yet
 
-    return prices
+    Same result as prices.ffill().dropna(), but done in one pass over the underlying
+    array instead of two full DataFrame copies.
+
+    Args:
+        prices: DataFrame of prices, possibly with gaps
+
+    Returns:
+        pandas DataFrame with no missing values
+    """
+    arr = prices.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(arr)
+
+    # A ticker with no prices at all leaves every row incomplete
+    if arr.size == 0 or not valid.any(axis=0).all():
+        return prices.iloc[0:0]
+
+    if not valid.all():
+        # Row index of the latest observation for each cell, carried down each column
+        last_valid = np.where(valid, np.arange(arr.shape[0])[:, None], 0)
+        np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+        arr = arr[last_valid, np.arange(arr.shape[1])]
+
+    # After the fill, a column is only missing before its first observation
+    first_complete = int(valid.argmax(axis=0).max())
+
+    return pd.DataFrame(arr[first_complete:], index=prices.index[first_complete:], columns=prices.columns)
+
+
+def _download_ticker_close(ticker: str, start_date: str, end_date: str):
+    """
+    Download close prices for a single ticker
+
+    Goes through Ticker.history, which is what yf.download does per ticker; yf.download
+    itself collects results in module-level state and is not safe to call from
+    several threads at once.
+
+    Args:
+        ticker: Ticker symbol
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+
+    Returns:
+        pandas Series of close prices, or None if Yahoo returned no data
+    """
+    history = yf.Ticker(ticker, session=session).history(
+        start=start_date,
+        end=end_date,
+        auto_adjust=False,
+        actions=False,
+        repair=False,
+        timeout=10,
+        raise_errors=True
+    )
+
+    if history.empty or 'Close' not in history.columns:
+        return None
+
+    # Match yf.download, which drops the exchange timezone for daily data
+    close = history['Close']
+    close.index = close.index.tz_localize(None)
+    return close
+
+
+def _download_bulk_close(tickers: list, start_date: str, end_date: str):
+    """
+    Download close prices for several tickers with a single yf.download call
+
+    Args:
+        tickers: List of ticker symbols (at most BULK_CHUNK_SIZE)
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+
+    Returns:
+        pandas DataFrame with a close price column per ticker (empty if no data)
+    """
+    with _yf_download_lock:
+        data = yf.download(
+            tickers,
+            start=start_date,
+            end=end_date,
+            progress=False,
+            repair=False,
+            threads=True,
+            timeout=10,
+            session=session
+        )
+
+    # Extract close prices
+    if data.empty or 'Close' not in data.columns:
+        return pd.DataFrame()
+
+    if len(tickers) == 1:
+        return pd.DataFrame({tickers[0]: data['Close']})
+
+    # Ticker.history also records failures in yfinance's shared state, so a concurrent
+    # fallback download can leave a stray symbol in the result; keep only what was asked for
+    return data['Close'].reindex(columns=tickers)
+
+
+def _download_individually(tickers: list, start_date: str, end_date: str):
+    """
+    Download close prices one ticker at a time, overlapping the per-ticker round-trips
+
+    Args:
+        tickers: List of ticker symbols
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+
+    Returns:
+        pandas DataFrame with a close price column per ticker that returned data
+    """
+    all_prices = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_DOWNLOAD_WORKERS, len(tickers)))) as executor:
+        futures = {
+            executor.submit(_download_ticker_close, ticker, start_date, end_date): ticker
+            for ticker in tickers
+        }
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                close = future.result()
+                if close is not None:
+                    all_prices[ticker] = close
+                    logger.info("    ✅ %s: %d days", ticker, len(close))
+            except Exception as ticker_error:
+                logger.warning("    ❌ %s: %s", ticker, ticker_error)
+
+    # Keep the requested ticker order regardless of completion order
+    return pd.DataFrame({t: all_prices[t] for t in tickers if t in all_prices})
 
 
-def fetch_stock_data(tickers: list, start_date: str, end_date: str = None):
+def fetch_stock_data(tickers: list, start_date: str, end_date: str = None, optional_tickers: list = None):
     """
     Fetch historical stock data from Yahoo Finance
 
@@ -89,6 +279,8 @@ def fetch_stock_data(tickers: list, start_date: str, end_date: str = None):
         tickers: List of ticker symbols
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format (defaults to today)
+        optional_tickers: Extra symbols (e.g. a benchmark) downloaded in the same pass;
+            one without a price for every day is left out instead of failing the request
 
     Returns:
         pandas DataFrame with adjusted close prices
@@ -97,86 +289,125 @@ def fetch_stock_data(tickers: list, start_date: str, end_date: str = None):
         if end_date is None:
             end_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Download data using yfinance - using download method with repair=True
-        print(f"Fetching data for {tickers} from {start_date} to {end_date}")
-
-        try:
-            # Try bulk download first (faster and more reliable)
-            data = yf.download(
-                tickers,
-                start=start_date,
-                end=end_date,
-                progress=False,
-                repair=True,
-                keepna=False,
-                timeout=10
-            )
-
-            # Extract close prices
-            if len(tickers) == 1:
-                if not data.empty and 'Close' in data.columns:
-                    prices = pd.DataFrame({tickers[0]: data['Close']})
-                else:
-                    prices = pd.DataFrame()
-            else:
-                if not data.empty and 'Close' in data.columns:
-                    prices = data['Close']
-                else:
-                    prices = pd.DataFrame()
-
-            print(f"  ✅ Downloaded {len(prices)} days for {len(prices.columns)} tickers")
-
-        except Exception as e:
-            print(f"  Bulk download failed: {e}")
-            print("  Trying individual downloads...")
-
-            # Fallback: download individually
-            all_prices = pd.DataFrame()
-            for ticker in tickers:
-                try:
-                    print(f"    Downloading {ticker}...")
-                    time.sleep(0.5)
-
-                    single_data = yf.download(
-                        ticker,
-                        start=start_date,
-                        end=end_date,
-                        progress=False,
-                        repair=True,
-                        timeout=10
-                    )
-
-                    if not single_data.empty and 'Close' in single_data.columns:
-                        all_prices[ticker] = single_data['Close']
-                        print(f"    ✅ {ticker}: {len(single_data)} days")
-                except Exception as ticker_error:
-                    print(f"    ❌ {ticker}: {str(ticker_error)}")
-                    continue
-
-            prices = all_prices
+        optional_tickers = [t for t in (optional_tickers or []) if t not in tickers]
+        all_tickers = tickers + optional_tickers
+
+        # Serve repeated requests for the same window from the in-process cache
+        cache_key = get_cache_key(all_tickers, start_date, end_date)
+        with _price_cache_lock:
+            cached_prices = _price_cache.get(cache_key)
+        if cached_prices is not None:
+            logger.info("Using cached data for %s from %s to %s", tickers, start_date, end_date)
+            return cached_prices.copy()
+
+        redis_key = f"prices:{cache_key}"
+        cached_prices = cache_get(redis_key)
+        if cached_prices is not None:
+            logger.info("Using Redis cached data for %s from %s to %s", tickers, start_date, end_date)
+            with _price_cache_lock:
+                _price_cache[cache_key] = cached_prices.copy()
+            return cached_prices
+
+        used_mock_data = False
+
+        # Download data using yfinance. Its price repair is left off (it costs extra
+        # requests and row scans per ticker); gaps are filled by _forward_fill_and_trim
+        logger.info("Fetching data for %s from %s to %s", all_tickers, start_date, end_date)
+
+        # Try bulk download first (faster and more reliable), in chunks of BULK_CHUNK_SIZE
+        # symbols. yf.download isn't thread-safe, so chunks run one after another and
+        # _download_bulk_close serialises calls from concurrent requests too; each chunk
+        # is still fetched in parallel inside yfinance
+        chunk_prices = []
+        failed_tickers = []
+        for i in range(0, len(all_tickers), BULK_CHUNK_SIZE):
+            chunk = all_tickers[i:i + BULK_CHUNK_SIZE]
+            try:
+                chunk_close = _download_bulk_close(chunk, start_date, end_date)
+                chunk_prices.append(chunk_close)
+                logger.info("  ✅ Downloaded %d days for %d tickers", len(chunk_close), len(chunk_close.columns))
+            except Exception as e:
+                logger.warning("  Bulk download failed: %s", e)
+                failed_tickers.extend(chunk)
+
+        if failed_tickers:
+            logger.info("  Trying individual downloads...")
+            chunk_prices.append(_download_individually(failed_tickers, start_date, end_date))
+
+        chunk_prices = [frame for frame in chunk_prices if not frame.empty]
+        # sort=True keeps the dates in order when chunks trade on different days (e.g. a
+        # crypto chunk with weekends joined to a stock chunk)
+        prices = pd.concat(chunk_prices, axis=1, sort=True) if chunk_prices else pd.DataFrame()
 
         # Handle empty data - fallback to mock data
-        if prices.empty or len(prices) == 0:
-            print("⚠️ Yahoo Finance failed, using mock data instead")
-            prices = generate_mock_stock_data(tickers, start_date, end_date)
+        required_columns = [t for t in prices.columns if t not in optional_tickers]
+        if not required_columns or prices[required_columns].empty:
+            logger.warning("⚠️ Yahoo Finance failed, using mock data instead")
+            prices = generate_mock_stock_data(all_tickers, start_date, end_date)
+            used_mock_data = True
+
+        # Clean the requested tickers on their own: a failed optional ticker comes back
+        # from yf.download as an all-NaN column and would otherwise empty the window
+        optional_prices = prices[[t for t in optional_tickers if t in prices.columns]]
+        prices = prices.drop(columns=optional_prices.columns)
 
         # Data cleaning - forward fill then drop remaining NaN rows
-        prices = prices.ffill()  # Forward fill missing values
-        prices = prices.dropna()  # Drop any remaining rows with NaN
+        prices = _forward_fill_and_trim(prices)
 
         # Check if we still have data after cleaning
         if prices.empty or len(prices) == 0:
             raise ValueError("No valid data available for the selected tickers and date range")
 
-        print(f"✅ Successfully fetched {len(prices)} days of data for {len(prices.columns)} ticker(s)")
+        # Keep optional tickers that have a price for every remaining day
+        optional_prices = optional_prices.ffill().reindex(prices.index)
+        complete = optional_prices.columns[optional_prices.notna().all().to_numpy()]
+        missing_optional = [t for t in optional_tickers if t not in complete]
+        if missing_optional:
+            logger.warning("  No usable data for optional ticker(s) %s, leaving them out", missing_optional)
+        if len(complete):
+            prices = prices.join(optional_prices[complete])
+
+        logger.info("✅ Successfully fetched %d days of data for %d ticker(s)", len(prices), len(prices.columns))
+
+        # Only cache complete real market data so a transient Yahoo outage doesn't pin
+        # mock prices or a missing benchmark
+        if not used_mock_data and not missing_optional:
+            with _price_cache_lock:
+                _price_cache[cache_key] = prices.copy()
+            cache_set(redis_key, prices, PRICE_REDIS_TTL)
 
         return prices
 
     except Exception as e:
-        print(f"Error fetching stock data: {e}")
+        logger.error("Error fetching stock data: %s", e)
         raise
 
 
+@lru_cache(maxsize=4096)
+def _load_stock_info(ticker: str):
+    """
+    Look up company information, memoized per process and shared via Redis
+
+    Raises on lookup failure so that failed lookups are not cached.
+    """
+    redis_key = f"stock_info:{ticker}"
+    info = cache_get(redis_key)
+    if info is not None:
+        return info
+
+    stock = yf.Ticker(ticker, session=session)
+    yf_info = stock.info
+
+    info = {
+        "ticker": ticker,
+        "name": yf_info.get("longName", ticker),
+        "sector": yf_info.get("sector", "N/A"),
+        "industry": yf_info.get("industry", "N/A")
+    }
+    cache_set(redis_key, info, STOCK_INFO_REDIS_TTL)
+    return info
+
+
 def get_stock_info(ticker: str):
     """
     Get company information for a ticker
@@ -188,18 +419,11 @@ def get_stock_info(ticker: str):
         dict with company info (name, sector, industry)
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-
-        return {
-            "ticker": ticker,
-            "name": info.get("longName", ticker),
-            "sector": info.get("sector", "N/A"),
-            "industry": info.get("industry", "N/A")
-        }
+        # Copy so callers can't modify the memoized entry
+        return dict(_load_stock_info(ticker))
 
     except Exception as e:
-        print(f"Error fetching stock info for {ticker}: {e}")
+        logger.warning("Error fetching stock info for %s: %s", ticker, e)
         return {
             "ticker": ticker,
             "name": ticker,
@@ -208,10 +432,26 @@ def get_stock_info(ticker: str):
         }
 
 
+def get_stock_infos(tickers: list):
+    """
+    Get company information for several tickers, looking up uncached ones concurrently
+
+    Args:
+        tickers: List of ticker symbols
+
+    Returns:
+        list of company info dicts in the same order as tickers
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_DOWNLOAD_WORKERS, len(tickers)))) as executor:
+        return list(executor.map(get_stock_info, tickers))
+
+
 def validate_ticker_format(ticker: str) -> bool:
     """
     Validate ticker format
 
+    Used by both /historical and /info so every endpoint accepts the same symbols.
+
     Args:
         ticker: Ticker symbol to validate
 
@@ -221,8 +461,7 @@ def validate_ticker_format(ticker: str) -> bool:
     if not ticker:
         return False
 
-    # Basic validation: alphanumeric and hyphens only
-    return ticker.replace("-", "").replace(".", "").isalnum()
+    return bool(_TICKER_RE.match(ticker))
 
 
 def get_cache_key(tickers: list, start_date: str, end_date: str) -> str:
@@ -238,4 +477,5 @@ def get_cache_key(tickers: list, start_date: str, end_date: str) -> str:
         str hash for caching
     """
     key_string = f"{','.join(sorted(tickers))}_{start_date}_{end_date}"
-    return hashlib.md5(key_string.encode()).hexdigest()
+    # Keys need not be cryptographic, so use the much faster non-cryptographic XXH3
+    return xxhash.xxh3_64_hexdigest(key_string.encode())
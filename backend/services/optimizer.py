@@ -5,48 +5,288 @@ Handles portfolio optimization calculations using Modern Portfolio Theory
 
 import pandas as pd
 import numpy as np
-from pypfopt import expected_returns, risk_models
+import logging
+import threading
+import xxhash
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from pypfopt import risk_models
 from pypfopt.efficient_frontier import EfficientFrontier
 
+from services.cache import cache_get, cache_set
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_fingerprint(frame: pd.DataFrame):
+    """Cache key for a returns frame: shape, a digest of every value, and the tickers"""
+    return hashkey(
+        frame.shape,
+        xxhash.xxh3_64_hexdigest(frame.to_numpy().tobytes()),
+        tuple(frame.columns)
+    )
+
+
+def calculate_returns(price_data: pd.DataFrame):
+    """
+    Calculate daily simple returns from prices
+
+    Args:
+        price_data: DataFrame with historical prices
+
+    Returns:
+        pandas DataFrame of float32 daily returns (one row fewer than price_data)
+    """
+    try:
+        # Column-major so per-ticker operations scan contiguous memory; pandas keeps
+        # this layout as its internal block without copying. Returns are stored as
+        # float32 to halve memory traffic; estimators accumulate in float64.
+        P = np.asfortranarray(price_data.to_numpy(dtype=np.float32))
+        R = P[1:] / P[:-1] - 1.0
+        return pd.DataFrame(R, index=price_data.index[1:], columns=price_data.columns)
+    except Exception as e:
+        logger.error("Error calculating returns: %s", e)
+        raise
+
 
 def calculate_expected_returns(price_data: pd.DataFrame):
     """
-    Calculate expected returns using CAPM
+    Calculate expected returns using CAPM (uncached; the endpoints use compute_mu_S)
 
     Args:
         price_data: DataFrame with historical prices
 
+    Returns:
+        pandas Series with expected returns for each ticker
+    """
+    return calculate_expected_returns_from_returns(calculate_returns(price_data))
+
+
+def _capm_return(X: np.ndarray, risk_free_rate: float = 0.02, frequency: int = 252):
+    """
+    CAPM expected returns against an equally-weighted market, as in pypfopt's capm_return
+
+    Args:
+        X: ndarray of daily returns (T x N)
+        risk_free_rate: Annual risk-free rate
+        frequency: Periods per year
+
+    Returns:
+        numpy ndarray of annualised expected returns, one per ticker
+    """
+    # Equally-weighted basket as the market proxy; betas are cov(asset, mkt) / var(mkt).
+    # The passes over X stay in its dtype so a float32 matrix is never upcast
+    mkt = X.mean(axis=1).astype(np.float64)
+    mkt_centered = mkt - mkt.mean()
+    betas = (X.T @ mkt_centered.astype(X.dtype)) / (mkt_centered @ mkt_centered)
+
+    # Compounded annual market return
+    mkt_mean_ret = np.prod(1.0 + mkt) ** (frequency / len(mkt)) - 1.0
+
+    return risk_free_rate + betas * (mkt_mean_ret - risk_free_rate)
+
+
+def calculate_expected_returns_from_returns(returns: pd.DataFrame, X: np.ndarray = None):
+    """
+    Calculate expected returns using CAPM from precomputed daily returns
+
+    Args:
+        returns: DataFrame with daily returns (see calculate_returns)
+        X: returns as an ndarray from _returns_matrix, if the caller already has it
+
     Returns:
         pandas Series with expected returns for each ticker
     """
     try:
-        # Use CAPM for expected returns (forward-looking)
-        mu = expected_returns.capm_return(price_data)
-        return mu
+        # Use CAPM for expected returns (forward-looking), same estimator as
+        # PyPortfolioOpt's capm_return with its defaults
+        if X is None:
+            X = _returns_matrix(returns)
+        return pd.Series(_capm_return(X), index=returns.columns)
     except Exception as e:
-        print(f"Error calculating expected returns: {e}")
+        logger.error("Error calculating expected returns: %s", e)
         raise
 
 
 def calculate_covariance_matrix(price_data: pd.DataFrame):
     """
-    Calculate covariance matrix using Ledoit-Wolf Shrinkage
+    Calculate covariance matrix using Ledoit-Wolf Shrinkage (uncached; the endpoints use compute_mu_S)
 
     Args:
         price_data: DataFrame with historical prices
 
+    Returns:
+        pandas DataFrame with covariance matrix
+    """
+    return calculate_covariance_matrix_from_returns(calculate_returns(price_data))
+
+
+def _returns_matrix(returns: pd.DataFrame):
+    """
+    float32 (T x N) ndarray of a returns frame for the estimators
+
+    A float32 frame from calculate_returns is returned as a view of its data; a copy is
+    only made to zero out NaNs, if there are any.
+    """
+    X = returns.to_numpy(dtype=np.float32)
+    # A NaN anywhere makes the total NaN, so this checks without a boolean temporary
+    if np.isnan(X.sum()):
+        X = np.nan_to_num(X)
+    return X
+
+
+def calculate_sample_cov_fast(returns: np.ndarray, ddof: int = 1):
+    """
+    Calculate the sample covariance of a returns matrix without a centered copy
+
+    Uses C = (RᵀR - T·m·mᵀ) / (T - ddof), i.e. one BLAS gemm over the raw matrix plus
+    a rank-1 correction, instead of materialising R - mean(R) first. With thousands of
+    days and a handful of tickers the centering copy dominates memory traffic.
+
+    The passes over the returns (gemm and column means) run in the input precision,
+    so float32 returns are never upcast; the N x N result is float64.
+
+    Args:
+        returns: ndarray of daily returns (T x N), one column per ticker
+        ddof: Delta degrees of freedom (1 = unbiased, 0 = maximum likelihood)
+
+    Returns:
+        numpy ndarray (N x N) float64 covariance matrix
+    """
+    n_samples = returns.shape[0]
+    mean = returns.mean(axis=0).astype(np.float64)
+    cov = (returns.T @ returns).astype(np.float64)
+    cov -= n_samples * np.outer(mean, mean)
+    cov /= n_samples - ddof
+    return cov
+
+
+def _ledoit_wolf_constant_variance(X: np.ndarray):
+    """
+    Ledoit-Wolf shrinkage towards a scaled identity, as in sklearn.covariance.ledoit_wolf
+
+    Built on calculate_sample_cov_fast so the returns are never centered in memory;
+    the per-day squared norms of the centered rows are expanded algebraically instead.
+
+    Args:
+        X: ndarray of daily returns (T x N), float32 or float64
+
+    Returns:
+        tuple: (shrunk float64 covariance ndarray, shrinkage constant)
+    """
+    n_samples, n_features = X.shape
+    mean = X.mean(axis=0)
+
+    emp_cov = calculate_sample_cov_fast(X, ddof=0)
+    target = np.trace(emp_cov) / n_features
+
+    # ||x_t - mean||² for every day, without forming x_t - mean. Everything that touches
+    # X stays in its dtype (mixing in a float64 vector would make NumPy upcast a full
+    # copy of X); only the per-day result is widened
+    sq_norms = (np.einsum('ij,ij->i', X, X) - 2.0 * (X @ mean)).astype(np.float64)
+    sq_norms += float(mean @ mean)
+    emp_cov_sq = np.sum(emp_cov ** 2)
+
+    beta = (sq_norms @ sq_norms / n_samples - emp_cov_sq) / (n_features * n_samples)
+    delta = (emp_cov_sq - n_features * target ** 2) / n_features
+    shrinkage = 0.0 if delta == 0 else min(beta, delta) / delta
+
+    shrunk_cov = (1.0 - shrinkage) * emp_cov
+    shrunk_cov.flat[::n_features + 1] += shrinkage * target
+    return shrunk_cov, shrinkage
+
+
+def calculate_covariance_matrix_from_returns(returns: pd.DataFrame, X: np.ndarray = None):
+    """
+    Calculate covariance matrix using Ledoit-Wolf Shrinkage from precomputed daily returns
+
+    Args:
+        returns: DataFrame with daily returns (see calculate_returns)
+        X: returns as an ndarray from _returns_matrix, if the caller already has it
+
     Returns:
         pandas DataFrame with covariance matrix
     """
     try:
-        # Use Ledoit-Wolf Shrinkage for robust covariance estimation
-        S = risk_models.CovarianceShrinkage(price_data).ledoit_wolf()
-        return S
+        # Use Ledoit-Wolf Shrinkage for robust covariance estimation (same estimator as
+        # PyPortfolioOpt's CovarianceShrinkage.ledoit_wolf, annualised the same way)
+        if X is None:
+            X = _returns_matrix(returns)
+        shrunk_cov, _ = _ledoit_wolf_constant_variance(X)
+        S = pd.DataFrame(shrunk_cov * 252, index=returns.columns, columns=returns.columns)
+        return risk_models.fix_nonpositive_semidefinite(S, fix_method="spectral")
     except Exception as e:
-        print(f"Error calculating covariance matrix: {e}")
+        logger.error("Error calculating covariance matrix: %s", e)
         raise
 
 
+@cached(TTLCache(maxsize=128, ttl=3600), key=_frame_fingerprint, lock=threading.Lock())
+def compute_mu_S(returns: pd.DataFrame):
+    """
+    Calculate CAPM expected returns and Ledoit-Wolf covariance together, cached per returns window
+
+    Both estimators are deterministic for a given window, so repeat requests for the
+    same tickers and dates skip the shrinkage entirely. Callers must not mutate the
+    returned objects.
+
+    Args:
+        returns: DataFrame with daily returns (see calculate_returns)
+
+    Returns:
+        tuple: (mu Series, S DataFrame)
+    """
+    # Convert (and NaN-clean) the returns once for both estimators
+    X = _returns_matrix(returns)
+    mu = calculate_expected_returns_from_returns(returns, X)
+    S = calculate_covariance_matrix_from_returns(returns, X)
+    return mu, S
+
+
+def compute_returns_mu_S(price_data: pd.DataFrame):
+    """
+    Calculate daily returns and their (cached) expected returns and covariance in one call
+
+    Lets API handlers run the whole pass over the prices in a single worker thread.
+
+    Args:
+        price_data: DataFrame with historical prices
+
+    Returns:
+        tuple: (returns DataFrame, mu Series, S DataFrame)
+    """
+    returns = calculate_returns(price_data)
+    mu, S = compute_mu_S(returns)
+    return returns, mu, S
+
+
+def _tangency_weights(mu, S, risk_free_rate: float = 0.02):
+    """
+    Closed-form max Sharpe portfolio, w ∝ S⁻¹(mu - rf), when it is already long-only
+
+    Without extra constraints the tangency portfolio solves max_sharpe exactly, so a
+    single linear solve replaces the convex solver. When it would short an asset the
+    long-only bound binds and the solver is needed instead.
+
+    Args:
+        mu: Expected returns (Series)
+        S: Covariance matrix (DataFrame)
+        risk_free_rate: Annual risk-free rate
+
+    Returns:
+        dict of ticker -> weight, or None if the closed form isn't a valid long-only solution
+    """
+    try:
+        raw = np.linalg.solve(np.asarray(S, dtype=np.float64), np.asarray(mu, dtype=np.float64) - risk_free_rate)
+    except np.linalg.LinAlgError:
+        return None
+
+    total = raw.sum()
+    if not np.isfinite(total) or total <= 0 or (raw < 0).any():
+        return None
+
+    return dict(zip(mu.index, raw / total))
+
+
 def optimize_portfolio(mu, S, optimization_type: str, target_volatility: float = None, max_weight: float = 1.0):
     """
     Optimize portfolio using Efficient Frontier
@@ -71,7 +311,11 @@ def optimize_portfolio(mu, S, optimization_type: str, target_volatility: float =
 
         # Perform optimization based on type
         if optimization_type == "max_sharpe":
-            weights = ef.max_sharpe()
+            tangency_weights = _tangency_weights(mu, S) if max_weight >= 1.0 else None
+            if tangency_weights is not None:
+                ef.set_weights(tangency_weights)
+            else:
+                weights = ef.max_sharpe()
         elif optimization_type == "min_volatility":
             weights = ef.min_volatility()
         elif optimization_type == "efficient_risk":
@@ -96,49 +340,116 @@ def optimize_portfolio(mu, S, optimization_type: str, target_volatility: float =
         return cleaned_weights, performance_metrics
 
     except Exception as e:
-        print(f"Error optimizing portfolio: {e}")
+        logger.error("Error optimizing portfolio: %s", e)
         raise
 
 
+# Portfolios simulated per block in simulate_efficient_frontier
+FRONTIER_BLOCK_SIZE = 2048
+
+# Fixed seed so the simulated cloud is a pure function of (mu, S, num_portfolios)
+FRONTIER_SEED = 42
+
+# Redis (when REDIS_URL is set) shares simulated frontiers across workers
+FRONTIER_REDIS_TTL = 3600
+
+
+def _frontier_cache_key(mu, S, num_portfolios: int = 5000):
+    """Cache key for a frontier simulation: the raw bytes of mu and S plus the sample count"""
+    return hashkey(
+        np.asarray(mu, dtype=np.float64).tobytes(),
+        np.asarray(S, dtype=np.float64).tobytes(),
+        num_portfolios
+    )
+
+
+def _frontier_redis_key(mu, S, num_portfolios: int):
+    """Redis key for a frontier simulation: an XXH3 digest of mu, S and the sample count"""
+    digest = xxhash.xxh3_64()
+    digest.update(np.asarray(mu, dtype=np.float64).tobytes())
+    digest.update(np.asarray(S, dtype=np.float64).tobytes())
+    digest.update(str(num_portfolios).encode())
+    return f"frontier:{digest.hexdigest()}"
+
+
+@cached(TTLCache(maxsize=64, ttl=900), key=_frontier_cache_key, lock=threading.Lock())
 def simulate_efficient_frontier(mu, S, num_portfolios: int = 5000):
     """
     Generate random portfolios for Efficient Frontier visualization
 
+    The simulation is seeded, so it is deterministic for given inputs, and results are
+    cached per (mu, S, num_portfolios) in process and in Redis; reopening the frontier
+    for the same inputs reuses the same cloud. The returned arrays are shared and
+    read-only.
+
     Args:
         mu: Expected returns (Series)
         S: Covariance matrix (DataFrame)
         num_portfolios: Number of random portfolios to generate
 
     Returns:
-        tuple: (returns_array, volatilities_array, sharpe_ratios_array)
+        tuple: (returns_array, volatilities_array, sharpe_ratios_array) as float32 ndarrays
     """
     try:
-        n_assets = len(mu)
-        results = np.zeros((3, num_portfolios))
-
-        for i in range(num_portfolios):
-            # Generate random weights
-            weights = np.random.random(n_assets)
-            weights /= np.sum(weights)  # Normalize to sum to 1
-
-            # Calculate portfolio return
-            portfolio_return = np.dot(weights, mu)
-
-            # Calculate portfolio volatility
-            portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(S, weights)))
+        redis_key = _frontier_redis_key(mu, S, num_portfolios)
+        cached_frontier = cache_get(redis_key)
+        if cached_frontier is not None:
+            for arr in cached_frontier:
+                arr.flags.writeable = False
+            return cached_frontier
 
-            # Calculate Sharpe ratio
-            sharpe_ratio = portfolio_return / portfolio_volatility if portfolio_volatility > 0 else 0
-
-            # Store results
-            results[0, i] = portfolio_return
-            results[1, i] = portfolio_volatility
-            results[2, i] = sharpe_ratio
-
-        return results[0, :].tolist(), results[1, :].tolist(), results[2, :].tolist()
+        n_assets = len(mu)
+        mu_arr = np.asarray(mu, dtype=np.float64)
+        S_arr = np.asarray(S, dtype=np.float64)
+        rng = np.random.default_rng(FRONTIER_SEED)
+
+        # With S = LLᵀ, sqrt(wᵀSw) = ||Lᵀw||, so volatilities need one gemm against the
+        # triangular factor instead of a gemm against S plus a row-wise dot. A singular
+        # S (e.g. perfectly correlated tickers) has no Cholesky factor; use S directly.
+        try:
+            L = np.linalg.cholesky(S_arr)
+        except np.linalg.LinAlgError:
+            L = None
+
+        # The frontier chart doesn't need double precision
+        port_returns = np.empty(num_portfolios, dtype=np.float32)
+        port_volatilities = np.empty(num_portfolios, dtype=np.float32)
+        port_sharpes = np.zeros(num_portfolios, dtype=np.float32)
+
+        # Stream the simulation in fixed-size blocks so the weight matrix and gemm
+        # temporaries stay cache-sized however many portfolios are requested
+        for start in range(0, num_portfolios, FRONTIER_BLOCK_SIZE):
+            stop = min(start + FRONTIER_BLOCK_SIZE, num_portfolios)
+
+            # Generate random weight vectors, each row normalized to sum to 1
+            weights = rng.random((stop - start, n_assets))
+            weights /= weights.sum(axis=1, keepdims=True)
+
+            # Portfolio returns (one matvec) and volatilities sqrt(wᵀSw) for every row (one gemm)
+            portfolio_returns = weights @ mu_arr
+            if L is not None:
+                portfolio_volatilities = np.linalg.norm(weights @ L, axis=1)
+            else:
+                portfolio_volatilities = np.sqrt(np.sum((weights @ S_arr) * weights, axis=1))
+
+            port_returns[start:stop] = portfolio_returns
+            port_volatilities[start:stop] = portfolio_volatilities
+
+            # Sharpe ratios, left at 0 where volatility is 0
+            np.divide(
+                portfolio_returns, portfolio_volatilities,
+                out=port_sharpes[start:stop], where=portfolio_volatilities > 0
+            )
+
+        for arr in (port_returns, port_volatilities, port_sharpes):
+            arr.flags.writeable = False
+
+        frontier = (port_returns, port_volatilities, port_sharpes)
+        cache_set(redis_key, frontier, FRONTIER_REDIS_TTL)
+        return frontier
 
     except Exception as e:
-        print(f"Error simulating efficient frontier: {e}")
+        logger.error("Error simulating efficient frontier: %s", e)
         raise
 
 
@@ -159,5 +470,5 @@ def calculate_dollar_allocations(weights: dict, investment_amount: float):
             allocations[ticker] = round(weight * investment_amount, 2)
         return allocations
     except Exception as e:
-        print(f"Error calculating dollar allocations: {e}")
+        logger.error("Error calculating dollar allocations: %s", e)
         raise
@@ -94,6 +94,46 @@ async function getEfficientFrontier(requestBody) {
     }
 }
 
+/**
+ * Get simulated efficient frontier portfolios as packed float32 arrays
+ * Much smaller than the JSON endpoint for large portfolio clouds
+ * @param {Object} requestBody - Frontier request parameters
+ * @param {number} numPortfolios - Number of portfolios to simulate (max 50000)
+ * @returns {Promise} Object with returns, volatilities and sharpe_ratios Float32Arrays
+ */
+async function getEfficientFrontierBinary(requestBody, numPortfolios = 5000) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/portfolio/efficient-frontier/binary?num_portfolios=${numPortfolios}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(requestBody)
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            const errorObj = new Error(error.detail || 'Failed to calculate efficient frontier');
+            errorObj.status = response.status;
+            throw errorObj;
+        }
+
+        // Body is [returns | volatilities | sharpe_ratios], each n float32 values
+        const data = new Float32Array(await response.arrayBuffer());
+        const n = parseInt(response.headers.get('X-Num-Portfolios'), 10) || data.length / 3;
+
+        return {
+            returns: data.subarray(0, n),
+            volatilities: data.subarray(n, 2 * n),
+            sharpe_ratios: data.subarray(2 * n, 3 * n)
+        };
+    } catch (error) {
+        console.error('Error fetching binary efficient frontier:', error);
+        handleApiError(error);
+        throw error;
+    }
+}
+
 /**
  * Save portfolio to database
  * @param {Object} portfolioData - Portfolio data to save